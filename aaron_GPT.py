@@ -2,6 +2,7 @@ import os
 
 import openai
 from openai import OpenAI
+from utils.utils import source_key, write_text_atomic
 
 
 
@@ -167,9 +168,7 @@ def read_file(file_path):
         file_content = file.read()
     return file_content
 def write_file(loc, text):
-    f = open(loc, "w")
-    f.write(text)
-    f.close()
+    write_text_atomic(loc, text)
 def compose_prompt(text_chunk, task):
     prompt = f"Task: {task}\nText:\n{text_chunk}\n"
     return prompt
@@ -285,7 +284,6 @@ def call_gpt(client, model, params):
 if __name__ == '__main__':
 
     key = source_key()
-    print(key)
     client = OpenAI(api_key=key)
     file_path= "/home/roy/Downloads/boris.txt"
     file_content=read_file(file_path)
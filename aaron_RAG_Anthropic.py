@@ -1,9 +1,11 @@
 from anthropic import Anthropic
+import asyncio
 import time
 import os
 from pathlib import Path
-from utils.utils import source_key, split_transcript_into_chunks, remove_before_token
-from utils.Anthropic_utils import clean_and_concat_chunks, process_transcript
+from utils.utils import source_key, split_transcript_into_chunks, remove_before_token, write_text_atomic
+from utils.Anthropic_utils import clean_and_concat_chunks, process_transcript, process_transcripts_concurrently, process_transcripts_batch, \
+    response_cache_key, read_cached_response, write_cached_response
 
 configs ={}
 configs['name'] = "insurance"
@@ -94,21 +96,28 @@ tasks = [
     # },
 
 ]
-def call_anthropic(system_prompt, task, transcript, long=False):
+def make_prompt(task, transcript):
+    return f"{task}. Here is the transcript: <data>{transcript}/<data>"
+
+def make_cached_prompt(task, transcript):
+    # The transcript goes first and is marked cacheable, so every task on the same
+    # lecture shares the system + transcript prefix and only the task text is new.
+    return [
+        {"type": "text", "text": f"Here is the transcript: <data>{transcript}/<data>",
+         "cache_control": {"type": "ephemeral"}},
+        {"type": "text", "text": task},
+    ]
+
+def call_anthropic(system_prompt, task, transcript, long=False, cache_dir=None, cache_max_age=None):
     # Get the API .
     claude_api_key = source_key("ANTHROPIC_API_KEY")
     if not claude_api_key:
         raise ValueError("ANTHROPIC_API_KEY is not set in the environment variables.")
-    client = Anthropic(
-        api_key=claude_api_key
-    )
 
-    prompt = f"{task}. Here is the transcript: <data>{transcript}/<data>"
     if long:
-        prompt_chunks = split_transcript_into_chunks(prompt)
-
-        full_response = []
+        prompt_chunks = split_transcript_into_chunks(make_prompt(task, transcript))
 
+        user_messages = []
         for i, chunk in enumerate(prompt_chunks):
             if i == 0:
                 user_message = f"""
@@ -125,13 +134,31 @@ def call_anthropic(system_prompt, task, transcript, long=False):
                 Next part of the transcript to process: {chunk}
                 Please continue processing the transcript.
                 """
+            user_messages.append(user_message)
 
-            chunk_response=process_transcript(client, configs['engine'], system_prompt, user_message)
-            full_response.append(chunk_response)
-            clean_response = clean_and_concat_chunks(full_response)
+        key = response_cache_key(configs['engine'], system_prompt, user_messages)
+        if cache_dir is not None:
+            cached = read_cached_response(cache_dir, key, cache_max_age)
+            if cached is not None:
+                return cached
+
+        # the parts are independent requests, so send them concurrently
+        full_response = asyncio.run(process_transcripts_concurrently(claude_api_key, configs['engine'], system_prompt, user_messages))
+        clean_response = clean_and_concat_chunks(full_response)
 
     else:
-        clean_response = process_transcript(client, configs['engine'], system_prompt, prompt)
+        user_message = make_cached_prompt(task, transcript)
+        key = response_cache_key(configs['engine'], system_prompt, user_message)
+        if cache_dir is not None:
+            cached = read_cached_response(cache_dir, key, cache_max_age)
+            if cached is not None:
+                return cached
+
+        # process_transcript does the retrying; SDK retries on top would multiply the attempts
+        client = Anthropic(
+            api_key=claude_api_key, max_retries=0
+        )
+        clean_response = process_transcript(client, configs['engine'], system_prompt, user_message)
 
         # response = client.messages.create(
         #     model="claude-3-sonnet-20240229",
@@ -150,13 +177,65 @@ def call_anthropic(system_prompt, task, transcript, long=False):
         #             chunk_correction += event.delta.text
         #
         # full_corrected_transcript.append(chunk_correction)
+    if cache_dir is not None:
+        write_cached_response(cache_dir, key, clean_response)
     return (clean_response)
 
-def process_all_tasks(system_prompt, transcript, tasks, out_dir):
+def save_task_output(task, response, out_dir):
+    name = task['name']
+    if name =="mind_map":
+        response=remove_before_token(response,"<svg")
+    out_path = os.path.join(out_dir, task['output_file'])
+    # Save the output to a file
+    write_text_atomic(out_path, response)
+    return response
+
+def process_all_tasks_batch(system_prompt, transcript, tasks, out_dir, cache_dir=None, cache_max_age=None):
+    # Offline build: one Message Batch for all the tasks (half the price of real-time calls)
+    claude_api_key = source_key("ANTHROPIC_API_KEY")
+    if not claude_api_key:
+        raise ValueError("ANTHROPIC_API_KEY is not set in the environment variables.")
+    client = Anthropic(
+        api_key=claude_api_key, max_retries=0
+    )
+    prompts = [make_cached_prompt(task['prompt'], transcript) for task in tasks]
+    keys = [response_cache_key(configs['engine'], system_prompt, prompt) for prompt in prompts]
+    responses = [None] * len(prompts)
+    if cache_dir is not None:
+        responses = [read_cached_response(cache_dir, key, cache_max_age) for key in keys]
+
+    # only tasks without a cached response go into the batch
+    misses = [i for i, response in enumerate(responses) if response is None]
+    if misses:
+        print(f"Submitting batch of {len(misses)} tasks ({len(prompts) - len(misses)} cached)")
+        batch_responses = process_transcripts_batch(client, configs['engine'], system_prompt, [prompts[i] for i in misses])
+        for i, response in zip(misses, batch_responses):
+            responses[i] = response
+            if response is not None and cache_dir is not None:
+                write_cached_response(cache_dir, keys[i], response)
+
+    results = {}
+    for task, response in zip(tasks, responses):
+        name = task['name']
+        if response is None:
+            print(f"Error processing task {name}: batch request failed")
+            continue
+        results[name] = save_task_output(task, response, out_dir)
+        print(f"Completed task: {name}")
+    return results
+
+def process_all_tasks(system_prompt, transcript, tasks, out_dir, batch=False, cache_max_age=None):
     # Create output directory if it doesn't exist
     output_path = Path(out_dir)
     output_path.mkdir(parents=True, exist_ok=True)
 
+    # identical (model, system, prompt) requests are answered from disk on reruns,
+    # unless the cached answer is older than cache_max_age seconds
+    cache_dir = os.path.join(out_dir, ".llm_cache")
+
+    if batch:
+        return process_all_tasks_batch(system_prompt, transcript, tasks, out_dir, cache_dir, cache_max_age)
+
     # Process each task
     results = {}
     try:
@@ -164,32 +243,25 @@ def process_all_tasks(system_prompt, transcript, tasks, out_dir):
             t0 = time.time()
             name = task['name']
             prompt = task['prompt']
-            output_file = task['output_file']
             print(f"Processing task: {name}")
-            results[name] = call_anthropic(system_prompt, prompt,transcript)
-            if name =="mind_map":
-                results[name]=remove_before_token(results[name],"<svg")
+            response = call_anthropic(system_prompt, prompt,transcript, cache_dir=cache_dir, cache_max_age=cache_max_age)
+            results[name] = save_task_output(task, response, out_dir)
             print(f"Completed task: {name}")
-            out_path = os.path.join(out_dir, output_file)
-            # Save the output to a file
-            with open(out_path, "w", encoding="utf-8") as f:
-                f.write(results[name])
             t1 = time.time()
-            print(f'Done {name}. ({t1 - t0:.3f}s). Sleeping')
-            time.sleep(10)  # Add a delay between tasks to avoid rate limiting
+            print(f'Done {name}. ({t1 - t0:.3f}s).')
 
     except Exception as e:
         print(f"Error processing task {name}: {str(e)}")
+    return results
 
 # Execute tasks
 t0 = time.time()
 # Load the text file
 
 file_path = f"/home/roy/OneDrive/WORK/ideas/aaron/{configs['name']}/{configs['num']}/lesson{configs['num']}.txt"
-with open(file_path, "r") as transcript_raw_file:
-    transcript = transcript_raw_file.read().strip()
+transcript = Path(file_path).read_text(encoding="utf-8").strip()
 out_dir = f"/home/roy/OneDrive/WORK/ideas/aaron/{configs['name']}/{configs['num']}/Anthropic"
-process_all_tasks(system_prompt,transcript,tasks,out_dir)
+process_all_tasks(system_prompt,transcript,tasks,out_dir, batch=True)
 
 #print (res)
 results = {}
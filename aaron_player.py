@@ -1,21 +1,59 @@
 import base64
 import os
-import io
 import collections
+from functools import lru_cache
+from pathlib import Path
+import html
 import numpy as np
 import streamlit as st
+import streamlit.components.v1 as components
 # from pydub import AudioSegment
 # from pydub.playback import play
 # from pydub.utils import make_chunks
 # from datetime import datetime
 import tkinter as tk
 from tkinter import filedialog
-from parse_AI_output import gpt_parser,range2start_end
+from parse_AI_output import gpt_parser,timestr2secs
 #from streamlit_extras.stylable_container import stylable_container
-from utils.utils import find_audio, find_txt, get_audio_file_content, get_binary_file_downloader_html
+from utils.utils import find_audio, find_txt, get_audio_file_content, get_binary_file_downloader_html, \
+    SEEK_PARENT_AUDIO_JS
 
 sections=["Short_Summary", "MindMap","Quiz", "Long_Summary","Concepts","Additional"]
 
+# session_state keys the app reads, with their values before anything is loaded
+SESSION_DEFAULTS = {
+    "dir": None,
+    "jump": 0,
+    "ai": False,
+    "short_summary": "",
+    "long_summary": "",
+    "concepts": None,
+    "mindmap": None,
+    "quiz": None,
+    "audio": None,
+    "audio_player": None,
+    "concepts_expd": None,
+    "audio_cont": None,
+}
+
+CONCEPTS_CSS = """
+<style>
+    .row { font-family: sans-serif; margin: 4px 0; }
+    .row button { margin: 2px; }
+</style>
+"""
+
+
+@lru_cache(maxsize=4096)
+def _esc_cached(s):
+    return html.escape(s, quote=True)
+
+
+def esc(s):
+    # concept names and time ranges are short and repeat on every rerun; long
+    # strings skip the cache so it stays small
+    return _esc_cached(s) if len(s) <= 128 else html.escape(s, quote=True)
+
 
 # Function to extract tags from the audio file
 def extract_tags():
@@ -52,6 +90,10 @@ def extract_tags():
         #     for name, script in item["scripts"]:
         #         button_html = f"<button onclick='{script}'>{name}</button>"
         #         col2.markdown(button_html, unsafe_allow_html=True)
+
+    # parse every start once, here, and keep it next to its range string
+    for term, times in data.items():
+        data[term] = [(tim, timestr2secs(tim.strip().partition('-')[0])) for tim in times]
     return data
 
 
@@ -120,32 +162,38 @@ def jump_player():
 # Function to display audio player
 def display_audio_player(cont):
     # File uploader
-    uploaded_file = cont.file_uploader("Choose an audio file", type=['mp3', 'wav'])
+    uploaded_file = cont.file_uploader("Choose an audio file", type=['mp3', 'wav'], key="audio_upload")
     if uploaded_file is not None:
-        st.session_state.audio_file = uploaded_file
-        st.session_state.audio_bytes = uploaded_file.getvalue()
-        st.session_state.audio_format = uploaded_file.type.split('/')[-1]
+        # getvalue() copies the whole file, so only take the copy when a different upload
+        # shows up (file_id changes per upload, unlike name and size); reruns with the
+        # same upload reuse the bytes already in session_state
+        audio_key = uploaded_file.file_id
+        if st.session_state.get('audio_key') != audio_key:
+            # release the previous file before copying the new one
+            st.session_state.pop('audio_bytes', None)
+            st.session_state.audio_key = audio_key
+            st.session_state.audio_bytes = uploaded_file.getvalue()
+            # st.audio takes the mime type itself, so there is nothing to parse
+            st.session_state.audio_format = uploaded_file.type
+    else:
+        # uploader cleared: don't keep the old file's bytes for the rest of the session
+        for k in ('audio_key', 'audio_bytes', 'audio_format'):
+            st.session_state.pop(k, None)
     audio= st.session_state.audio
 
-    if 'audio_file' in st.session_state:
+    if 'audio_bytes' in st.session_state:
         cont.markdown("**Player**")
         # Display audio player
         #   audio_key = st.session_state.get('audio_key', 0)
         col1, col2 = cont.columns([2, 15])
 
         with col2:
-            st.audio(st.session_state.audio_bytes, format=st.session_state.audio_format,
-                 start_time=st.session_state.get('start_time', 0))  # , key=audio_key)
+            st.audio(st.session_state.audio_bytes, format=st.session_state.audio_format)
 
-        # Manage playback times
-        if 'playback_times' not in st.session_state:
-            st.session_state.playback_times = {}
         with col1:
-            st.session_state.playback_times["0"]=0
-            if st.button("⏪", key="0"):
-                # Set the start time and increment the key to force re-render of the audio player
-                st.session_state.start_time = 0
-                st.rerun()
+            # seeks the player in the browser like the concept buttons do; re-rendering
+            # st.audio with the same start_time would not move it
+            components.html(f'<button data-t="0">⏪</button>{SEEK_PARENT_AUDIO_JS}', height=45)
 
 
     # Style buttons as links
@@ -281,25 +329,22 @@ def show_concepts(cont, tags):
       #   }
       #   </style>
       #   """, unsafe_allow_html=True)
+        # One component for all the concepts: a button seeks the st.audio element on the
+        # page directly, so a click costs no widget per time and no script rerun
+        # every fragment goes into one list that is joined once, with no per-row strings
+        out = [CONCEPTS_CSS]
+        ap = out.append
         for tag, times in tags.items():
-            l = len(times)
-            columns = cont.columns(l + 1)
-            with columns[0]:
-                cont.markdown(f"**{tag}**: ")
-            # Add custom CSS to align columns to the right
-         #   alignment_css = "<style> .st-horizonal { justify-content: right; } </style>"
-          #  st.write(alignment_css, unsafe_allow_html=True)
-            for i, tim in enumerate(times):
-                with columns[i + 1]:
-                    start_secs, end_secs = range2start_end(tim.strip())
-                    key = f'{tag}_{tim}'
-                    st.session_state.playback_times[key] = start_secs
-
-                    #    if key not in st.session_state:
-                    if st.button(tim, key=key):
-                        st.session_state["start_time"] = start_secs
-                        st.rerun()
-            cont.divider()
+            ap('<div class="row" dir="auto"><b>')
+            ap(esc(tag))
+            ap('</b>: ')
+            # times are (range string, start seconds) pairs, parsed once in extract_tags
+            for tim, start_secs in times:
+                ap(f'<button data-t="{start_secs}">{esc(tim)}</button>')
+            ap('</div><hr>')
+        ap(SEEK_PARENT_AUDIO_JS)
+        with cont:
+            components.html("".join(out), height=min(60 * len(tags) + 20, 600), scrolling=True)
 
 
 def get_body(str):
@@ -321,10 +366,8 @@ def find_body_of(task):
     if 'dir' in st.session_state or st.session_state['dir']!='':
         file_name = find_txt(st.session_state["dir"], task)
         if file_name is not None:
-            f = io.open(file_name, mode="r", encoding="utf-8")
-            content = f.read()
+            content = Path(file_name).read_text(encoding="utf-8")
             body=get_body(content)
-            f.close()
         return body
 
     
@@ -416,30 +459,9 @@ def load_AI(cont):
 #             for timepoint in timepoints:
 #                 cont.markdown(f"<font color='green'>{tag}</font>: {timepoint // 60:02d}:{timepoint % 60:02d}", unsafe_allow_html=True)
 def init():
-    if 'dir' not in st.session_state:
-        st.session_state["dir"] = None
-    if 'jump' not in st.session_state:
-        st.session_state["jump"] = 0
-    if 'ai' not in st.session_state:
-        st.session_state["ai"] = False
-    if 'short_summary' not in st.session_state:
-        st.session_state["short_summary"] = ""
-    if 'long_summary' not in st.session_state:
-        st.session_state["long_summary"] = ""
-    if 'concepts' not in st.session_state:
-        st.session_state["concepts"] = None
-    if 'mindmap' not in st.session_state:
-            st.session_state["mindmap"] = None
-    if 'quiz' not in st.session_state:
-        st.session_state["quiz"] = None
-    if 'audio' not in st.session_state:
-        st.session_state["audio"] = None
-    if 'audio_player' not in st.session_state:
-        st.session_state["audio_player"] = None
-    if 'concepts_expd' not in st.session_state:
-        st.session_state["concepts_expd"] = None
-    if 'audio_cont' not in st.session_state:
-            st.session_state["audio_cont"] = None
+    # one pass over the defaults instead of an `in` check plus assignment per key
+    for key, value in SESSION_DEFAULTS.items():
+        st.session_state.setdefault(key, value)
 
 # Streamlit app
 def main():
@@ -2,75 +2,76 @@ import streamlit as st
 import streamlit.components.v1 as components
 import base64
 
+# static part of the player; the per-render values come from the container's data-* attributes
+PLAYER_JS = """
+<script>
+    const container = document.getElementById('audio-player-container');
+    const audioPlayer = document.getElementById('audio-player');
+    const timeDisplay = document.getElementById('time-display');
+
+    audioPlayer.ontimeupdate = function() {
+        const minutes = Math.floor(audioPlayer.currentTime / 60);
+        const seconds = Math.floor(audioPlayer.currentTime % 60);
+        timeDisplay.textContent = minutes.toString().padStart(2, '0') + ':' + seconds.toString().padStart(2, '0');
+    };
+
+    function updatePlayerTime(time) {
+        audioPlayer.currentTime = time;
+        audioPlayer.play();
+    }
+
+    // The iframe is reloaded whenever this html changes (e.g. new audio), so remember the
+    // last applied jump on the parent window and only seek for a newer one. The parent
+    // lives as long as the Streamlit session's page, like jump_id itself.
+    const jumpId = Number(container.dataset.jump);
+    if (jumpId > (window.parent.audioPlayerJumpId || 0)) {
+        window.parent.audioPlayerJumpId = jumpId;
+        updatePlayerTime(Number(container.dataset.time));
+    }
+</script>
+"""
+
 
 def init_player_state():
     if 'player_state' not in st.session_state:
         st.session_state.player_state = {
             'current_time': 0,
-            'update_time': False
+            'jump_id': 0
         }
 
 
+def encoded_audio(audio_data):
+    # Base64 once per audio object: callers keep the same bytes in session_state
+    # across reruns, so an identity check replaces re-encoding (or hashing) MBs of audio.
+    state = st.session_state.player_state
+    if state.get('b64_source') is not audio_data:
+        state['b64_source'] = audio_data
+        state['b64'] = base64.b64encode(audio_data).decode()
+    return state['b64']
+
+
 def st_audio_player(audio_data, audio_format):
     init_player_state()
+    state = st.session_state.player_state
 
-    b64 = base64.b64encode(audio_data).decode()
+    b64 = encoded_audio(audio_data)
     audio_tag = f'<audio id="audio-player" style="width:100%;" controls><source src="data:audio/{audio_format};base64,{b64}" type="audio/{audio_format}"></audio>'
 
+    # The pending jump is rendered into the page instead of the page polling for it.
+    # jump_id changes only when jump_to is called, so the html (and the iframe) stays
+    # the same on other reruns and playback is not interrupted.
     custom_html = f"""
-    <div id="audio-player-container">
+    <div id="audio-player-container" data-jump="{state['jump_id']}" data-time="{state['current_time']}">
         {audio_tag}
         <p>Current Time: <span id="time-display">00:00</span></p>
     </div>
-    <script>
-        const audioPlayer = document.getElementById('audio-player');
-        const timeDisplay = document.getElementById('time-display');
-
-        audioPlayer.ontimeupdate = function() {{
-            const minutes = Math.floor(audioPlayer.currentTime / 60);
-            const seconds = Math.floor(audioPlayer.currentTime % 60);
-            timeDisplay.textContent = minutes.toString().padStart(2, '0') + ':' + seconds.toString().padStart(2, '0');
-        }};
-
-        function updatePlayerTime(time) {{
-            audioPlayer.currentTime = time;
-            audioPlayer.play();
-        }}
-
-        // Check for updates
-        setInterval(() => {{
-            if (window.parent.streamlitSyncWithPlayer_getState) {{
-                const state = window.parent.streamlitSyncWithPlayer_getState();
-                if (state && state.update_time) {{
-                    updatePlayerTime(state.current_time);
-                    window.parent.streamlitSyncWithPlayer_resetUpdate();
-                }}
-            }}
-        }}, 100);
-    </script>
+    {PLAYER_JS}
     """
 
     components.html(custom_html, height=150)
 
 
 def jump_to(time):
+    init_player_state()
     st.session_state.player_state['current_time'] = time
-    st.session_state.player_state['update_time'] = True
-
-
-# Expose functions to JavaScript
-components.html(
-    """
-    <script>
-    function streamlitSyncWithPlayer_getState() {
-        return window.parent.pywebview.state['player_state'];
-    }
-
-    function streamlitSyncWithPlayer_resetUpdate() {
-        window.parent.pywebview.state['player_state']['update_time'] = false;
-    }
-    </script>
-    """,
-    height=0,
-)
-
+    st.session_state.player_state['jump_id'] += 1
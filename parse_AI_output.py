@@ -1,29 +1,36 @@
-import numpy as np
+import re
+from functools import lru_cache
+from pathlib import Path
+
+# section headers in the GPT output: #1 summary, #2 concepts, #3 quiz
+SECTION_RE = re.compile(r"#[23]")
+TIME_RE = re.compile(r"\s*(?:(?P<h>\d+)\s*:\s*)?(?P<m>\d+)\s*:\s*(?P<s>\d+)\s*")
+# bound once, so the slow path skips the attribute lookup on every call
+time_fullmatch = TIME_RE.fullmatch
 
 
 def load_file(demofile):
-    f = open(demofile, "r")
-    return f.read()
+    return Path(demofile).read_text(encoding="utf-8")
 def timestr2secs(t_str):
-    secs=0
-    t_arr=t_str.split(':')
-    l=len(t_arr)
-    if l==2:
-        secs=int(t_arr[0])*60+int(t_arr[1])
-    elif l==3:
-        secs=int(t_arr[0])*3600+int(t_arr[1])*60+int(t_arr[2])
-    return secs
-
+    # fast path for the canonical "mm:ss" / "hh:mm:ss" the model almost always writes
+    n = len(t_str)
+    if n == 5 and t_str[2] == ':' and t_str[:2].isdecimal() and t_str[3:].isdecimal():
+        return int(t_str[:2]) * 60 + int(t_str[3:])
+    if (n == 8 and t_str[2] == ':' and t_str[5] == ':' and t_str[:2].isdecimal()
+            and t_str[3:5].isdecimal() and t_str[6:].isdecimal()):
+        return int(t_str[:2]) * 3600 + int(t_str[3:5]) * 60 + int(t_str[6:])
+    # strip before the cache so " 01:10" and "01:10" share one entry
+    return _timestr2secs(t_str.strip())
 
 
+@lru_cache(maxsize=4096)
+def _timestr2secs(t_str):
+    # "mm:ss" or "hh:mm:ss"; anything else counts as 0
+    m = time_fullmatch(t_str)
+    if m is None:
+        return 0
+    return int(m['h'] or 0) * 3600 + int(m['m']) * 60 + int(m['s'])
 
-def range2start_end(range_str):
-    r_arr = range_str.split('-')
-    s_str = r_arr[0]
-    s_secs= timestr2secs(s_str)
-    e_str = r_arr[1]
-    e_secs=timestr2secs(e_str)
-    return s_secs,e_secs
 
 class gpt_parser:
     def __init__(self):
@@ -52,9 +59,9 @@ class gpt_parser:
             q = block_arr[0]
             n_choices= len(block_arr)-2 # one answer one question
             choices=[]
-            for choice in np.arange(1,n_choices+1):
+            for choice in range(1,n_choices+1):
                 choices.append(block_arr[choice])
-            correct =  block_arr[len(block_arr)-1].replace("*","").replace(" ","")
+            correct =  block_arr[-1].replace("*","").replace(" ","")
             correct_arr= correct.split(",")
             tuple_block = (q, choices,correct_arr)
             self.quiz[i]=tuple_block
@@ -65,15 +72,11 @@ class gpt_parser:
 
 
     def parse(self, content):
-        start_summary = 3
-        end_summary = content.find("#2")
-        self.summary = content[start_summary:end_summary]
-        end_concepts= content.find("#3")
-        concepts=content[end_summary+3:end_concepts]
-        self.analyze_concepts(concepts)
-#        end_quiz= content.find("***")
-        quiz= content[end_concepts+3:]
-        self.analyze_quiz(quiz)
+        # one scan splits "#1\n...#2\n...#3\n..." into its three sections
+        summary, concepts, quiz = (SECTION_RE.split(content, maxsplit=2) + ["", ""])[:3]
+        self.summary = summary[3:]
+        self.analyze_concepts(concepts[1:])
+        self.analyze_quiz(quiz[1:])
       #  print(quiz)
 
 if __name__ == '__main__':
@@ -1,39 +1,67 @@
+import os
 import streamlit as st
 import streamlit.components.v1 as components
 import streamlit as st
 
+from utils.utils import wav_to_mp3, SEEK_PARENT_AUDIO_JS
+
+# session_state entries that belong to the currently loaded file
+AUDIO_KEYS = ('audio_key', 'audio_bytes', 'audio_format')
+
+
+def audio_for_playback(uploaded_file):
+    # WAV uploads are transcoded to MP3 once per upload, so the session holds, and
+    # every play of the file moves, a tenth of the bytes
+    data = uploaded_file.getvalue()
+    if os.path.splitext(uploaded_file.name)[1].lower() == '.wav':
+        mp3 = wav_to_mp3(data)
+        if mp3 is not None:
+            return mp3, 'audio/mpeg'
+    return data, uploaded_file.type
+
+
 def main():
     st.title("Audio Player with Dynamic Control Buttons")
 
     # File uploader
-    uploaded_file = st.file_uploader("Choose an audio file", type=['mp3', 'wav'])
+    uploaded_file = st.file_uploader("Choose an audio file", type=['mp3', 'wav'], key="audio_upload")
     if uploaded_file is not None:
-        # Store audio file in session state if newly uploaded
-        if 'audio_file' not in st.session_state or uploaded_file.name != st.session_state.audio_file.name:
-            st.session_state.audio_file = uploaded_file
-            st.session_state.audio_bytes = uploaded_file.getvalue()
-            st.session_state.audio_format = uploaded_file.type.split('/')[-1]
-
-    if 'audio_file' in st.session_state:
-        # Display audio player
-     #   audio_key = st.session_state.get('audio_key', 0)
-        st.audio(st.session_state.audio_bytes, format=st.session_state.audio_format, start_time=st.session_state.get('start_time', 0))#, key=audio_key)
+        # getvalue() copies the whole file, so only take the copy (and transcode it)
+        # when a different upload shows up; reruns reuse the bytes in session_state
+        if st.session_state.get('audio_key') != uploaded_file.file_id:
+            # release the previous file before loading the new one
+            for k in AUDIO_KEYS:
+                st.session_state.pop(k, None)
+            st.session_state.audio_key = uploaded_file.file_id
+            st.session_state.audio_bytes, st.session_state.audio_format = audio_for_playback(uploaded_file)
+    else:
+        # uploader cleared: forget the file and its bookmarks
+        for k in AUDIO_KEYS + ('playback_times',):
+            st.session_state.pop(k, None)
 
+    if 'audio_bytes' in st.session_state:
         # Manage playback times
         if 'playback_times' not in st.session_state:
             st.session_state.playback_times = []
 
-        new_time = st.number_input("Enter time in seconds", min_value=0, step=1, key='new_time')
-        if st.button("Add Time"):
-            st.session_state.playback_times.append(new_time)
+        # A form only reruns on submit, so several times can be added in one go
+        with st.form("add_times", clear_on_submit=True):
+            times_str = st.text_input("Times in seconds (comma-separated)")
+            if st.form_submit_button("Add Times"):
+                # (time, button html): the fragment is built once here, not on every rerun
+                st.session_state.playback_times += [
+                    (t, f'<button data-t="{t}">Play from {t}s</button>')
+                    for t in (int(x) for x in times_str.split(',') if x.strip().isdecimal())]
+
+        # st.audio hands the bytes to Streamlit's media endpoint, which answers Range
+        # requests, so playback starts after the first chunk instead of after the
+        # browser has parsed a whole base64 data URL
+        st.audio(st.session_state.audio_bytes, format=st.session_state.audio_format)
 
-        # Displaying playback buttons
-        for index, time in enumerate(st.session_state.playback_times):
-            if st.button(f"Play from {time}s", key=f"time_{index}"):
-                # Set the start time and increment the key to force re-render of the audio player
-                st.session_state.start_time = time
-                st.rerun()
-#                st.session_state.audio_key += 1
+        # The buttons seek that player from a component; the iframe is same-origin, so
+        # a click moves the playhead with no rerun and no re-download
+        buttons = "".join(button for _, button in st.session_state.playback_times)
+        components.html(f"<div>{buttons}</div>{SEEK_PARENT_AUDIO_JS}", height=80, scrolling=True)
 
 
 if __name__ == "__main__":
@@ -42,7 +70,6 @@ if __name__ == "__main__":
 
 # # from pydub import AudioSegment
 # # import io
-# import threading
 #
 # import streamlit as st
 # import time
@@ -70,36 +97,29 @@ if __name__ == "__main__":
 #             else:
 #                 raise FileNotFoundError(f"The file {audio_file} does not exist.")
 #         else:  # If it's a file object (e.g., from st.file_uploader)
+#             # read() starts at the current position, which is the end of the file after
+#             # a rerun has already consumed it; rewind so it never silently returns b""
+#             audio_file.seek(0)
 #             audio_bytes = audio_file.read()
 #             file_extension = os.path.splitext(audio_file.name)[1][1:].lower()
 #             self.audio = AudioSegment.from_file(io.BytesIO(audio_bytes), format=file_extension)
 #
-#         self.audio = self.audio.set_frame_rate(self.sample_rate).set_channels(1)
+#         self.audio = self.audio.set_frame_rate(self.sample_rate).set_sample_width(2).set_channels(1)
+#         # decode once into int16 samples; frames are views into this array
+#         self.samples = np.frombuffer(self.audio.raw_data, dtype=np.int16)
+#         self.silence = np.zeros(self.sample_rate // 30, dtype=np.int16)
 #     def get_audio_frame(self):
 #         if self.playing:
-#             start_sample = int(self.play_time * self.sample_rate)
-#             end_sample = start_sample + self.sample_rate // 30  # 30 fps
-#             samples = self.audio[start_sample:end_sample].get_array_of_samples()
+#             n = self.sample_rate // 30  # 30 fps
+#             i = int(self.play_time * self.sample_rate) % len(self.samples)
 #             self.play_time += 1 / 30
-#             if self.play_time >= len(self.audio) / 1000:
+#             if self.play_time >= len(self.samples) / self.sample_rate:
 #                 self.play_time = 0
-#             return np.array(samples, dtype=np.int16)
+#             return self.samples[i:i + n]
 #         else:
-#             return np.zeros(self.sample_rate // 30, dtype=np.int16)
+#             return self.silence
 #
 #
-# class AudioPlayer:
-#     def __init__(self):
-#         self.audio = None
-#         self.play_time = 0
-#         self.playing = False
-#         self.duration = 0
-#
-#     def load_audio(self, audio_file):
-#         audio_bytes = audio_file.read()
-#         self.audio = AudioSegment.from_file(io.BytesIO(audio_bytes), format=audio_file.name.split('.')[-1])
-#         self.duration = len(self.audio) / 1000  # Duration in seconds
-#
 # def audio_frame_callback(frame):
 #     new_frame = av.AudioFrame.from_ndarray(
 #         audio_player.get_audio_frame(), format='s16', layout='mono')
@@ -107,65 +127,6 @@ if __name__ == "__main__":
 #     return new_frame
 #
 #
-# def main():
-#     st.title("Custom Audio Player")
-#
-#     audio_player = AudioPlayer()
-#
-#     audio_file = st.file_uploader("Choose an audio file", type=["mp3", "wav"])
-#
-#     if audio_file is not None:
-#         try:
-#             audio_player.load_audio(audio_file)
-#
-#             # Display the built-in audio player
-#             st.audio(audio_file)
-#
-#             # Control buttons
-#             col1, col2, col3, col4 = st.columns(4)
-#
-#             with col1:
-#                 if st.button("Play/Pause"):
-#                     audio_player.playing = not audio_player.playing
-#
-#             with col2:
-#                 if st.button("Jump to Start"):
-#                     audio_player.play_time = 0
-#
-#             with col3:
-#                 if st.button("Jump to 1 Minute"):
-#                     audio_player.play_time = min(60, audio_player.duration)
-#
-#             with col4:
-#                 if st.button("Jump to 5 Minutes"):
-#                     audio_player.play_time = min(300, audio_player.duration)
-#
-#             # Progress bar and time display
-#             progress = st.progress(0)
-#             time_display = st.empty()
-#
-#             def update_progress():
-#                 while True:
-#                     if audio_player.playing:
-#                         audio_player.play_time += 0.1
-#                         if audio_player.play_time >= audio_player.duration:
-#                             audio_player.play_time = 0
-#                             audio_player.playing = False
-#                         progress.progress(audio_player.play_time / audio_player.duration)
-#                         mins, secs = divmod(int(audio_player.play_time), 60)
-#                         time_display.text(f"Current Position: {mins:02d}:{secs:02d}")
-#                     time.sleep(0.1)
-#
-#             # Start the progress update in a separate thread
-#         #    threading.Thread(target=update_progress, daemon=True).start()
-#
-#             # Keep the app running
-#             st.write("Audio player is ready. Use the controls above to play/pause and navigate.")
-#           #  st.write("Note: The built-in player and custom controls are not synchronized.")
-#            # st.write("Close the browser tab to stop the application.")
-#
-#         except Exception as e:
-#             st.error(f"Error loading audio file: {str(e)}")
 # def main1():
 #     st.title("Synchronized Audio Player")
 #
@@ -207,31 +168,21 @@ if __name__ == "__main__":
 #                 if st.button("Jump to 5 Minutes"):
 #                     audio_player.play_time = min(300, audio_duration)
 #
-#             # Progress bar and time display
-#             progress = st.progress(0)
-#             time_display = st.empty()
-#
-#             def update_progress():
-#                 while True:
-#                     if webrtc_ctx.state.playing:
-#                         progress.progress(audio_player.play_time / audio_duration)
-#                         mins, secs = divmod(int(audio_player.play_time), 60)
-#                         time_display.text(f"Current Position: {mins:02d}:{secs:02d}")
-#                     time.sleep(0.1)
-#
-#             # Start the progress update in a separate thread
-#             threading.Thread(target=update_progress, daemon=True).start()
+#             # Position is read when the script reruns (e.g. on a button click); no
+#             # background thread that outlives the tab
+#             if webrtc_ctx.state.playing:
+#                 st.progress(min(audio_player.play_time / audio_duration, 1.0))
+#                 mins, secs = divmod(int(audio_player.play_time), 60)
+#                 st.text(f"Current Position: {mins:02d}:{secs:02d}")
 #
-#             # Keep the app running
 #             st.write("Audio player is ready. Use the controls above to play/pause and navigate.")
-#             st.write("Close the browser tab to stop the application.")
 #
 #         except Exception as e:
 #             st.error(f"Error loading audio file: {str(e)}")
 #
 # if __name__ == "__main__":
-#     audio_player = AudioPlayer()
-#     main()
+#     audio_player = AudioPlayer1()
+#     main1()
 #
 #
 # #
@@ -1,3 +1,16 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+import time
+from anthropic import APIConnectionError, APIStatusError, AsyncAnthropic
+from utils.utils import write_text_atomic
+
+# rate limited (429), server errors and overloaded (529) are worth another try
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504, 529)
+
+
 def clean_and_concat_chunks(chunks):
     cleaned_chunks = []
     for chunk in chunks:
@@ -28,7 +41,7 @@ def clean_and_concat_chunks(chunks):
 
     return full_transcript
 
-def process_transcript(client, model, system_prompt, user_message):
+def stream_transcript(client, model, system_prompt, user_message):
     # messages = [
     #     {"role": "user", "content": f"{task_instruction}\n\nHere's the full transcript:\n\n{transcript}"}
     # ]
@@ -43,12 +56,161 @@ def process_transcript(client, model, system_prompt, user_message):
     stream=True
     )
 
-    chunk_correction = ""
+    # collect the deltas and join once; += on a str is quadratic for long outputs
+    parts = []
     for event in response:
+        if hasattr(event, 'type') and event.type == "message_start":
+            usage = event.message.usage
+            print(f"input tokens: {usage.input_tokens}, cache read: {getattr(usage, 'cache_read_input_tokens', 0)}, "
+                  f"cache write: {getattr(usage, 'cache_creation_input_tokens', 0)}")
+        elif hasattr(event, 'type') and event.type == "content_block_delta":
+            if hasattr(event.delta, 'text'):
+                parts.append(event.delta.text)
+
+    return("".join(parts))
+
+
+def should_retry(error):
+    if isinstance(error, APIConnectionError):
+        return True
+    if not isinstance(error, APIStatusError):
+        return False
+    # an overload reported mid-stream arrives as an error event on a 200 response
+    body = error.body if isinstance(error.body, dict) else {}
+    error_type = body.get("error", {}).get("type") if isinstance(body.get("error"), dict) else None
+    return error.status_code in RETRY_STATUS_CODES or error_type == "overloaded_error"
+
+
+def retry_delay(attempt, error=None, initial_delay=1.0, max_delay=30.0):
+    """
+    Seconds to wait before retry number attempt (0-based): the server's Retry-After
+    when it sent one, otherwise exponential backoff with jitter. Capped at max_delay.
+    """
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    try:
+        delay = float(retry_after)
+    except (TypeError, ValueError):
+        delay = initial_delay * (2 ** attempt) + random.uniform(0, 1)
+    return min(delay, max_delay)
+
+
+def process_transcript(client, model, system_prompt, user_message, max_retries=5):
+    for attempt in range(max_retries + 1):
+        try:
+            return stream_transcript(client, model, system_prompt, user_message)
+        except (APIConnectionError, APIStatusError) as e:
+            if attempt == max_retries or not should_retry(e):
+                raise
+            delay = retry_delay(attempt, e)
+            print(f"Claude request failed ({e}). Retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+
+async def stream_transcript_async(client, model, system_prompt, user_message):
+    # same as stream_transcript, for an AsyncAnthropic client
+    response = await client.messages.create(
+        model=model,
+        system=system_prompt,
+        max_tokens=2000,
+        messages=[
+            {"role": "user", "content": user_message}
+        ],
+        stream=True
+    )
+
+    parts = []
+    async for event in response:
         if hasattr(event, 'type') and event.type == "content_block_delta":
             if hasattr(event.delta, 'text'):
-                chunk_correction += event.delta.text
+                parts.append(event.delta.text)
+
+    return("".join(parts))
+
+
+async def process_transcript_async(client, model, system_prompt, user_message, max_retries=5):
+    for attempt in range(max_retries + 1):
+        try:
+            return await stream_transcript_async(client, model, system_prompt, user_message)
+        except (APIConnectionError, APIStatusError) as e:
+            if attempt == max_retries or not should_retry(e):
+                raise
+            delay = retry_delay(attempt, e)
+            print(f"Claude request failed ({e}). Retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+
+async def process_transcripts_concurrently(api_key, model, system_prompt, user_messages, max_concurrency=5):
+    """
+    Send every user message at once (at most max_concurrency in flight) and
+    return the responses in the order of user_messages.
+    """
+    sem = asyncio.Semaphore(max_concurrency)
+
+    # the client (and its connection pool) lives and is closed inside this event loop;
+    # process_transcript_async does the retrying, so the SDK's own retries are off
+    async with AsyncAnthropic(api_key=api_key, max_retries=0) as client:
+        async def bound(user_message):
+            async with sem:
+                return await process_transcript_async(client, model, system_prompt, user_message)
+
+        return await asyncio.gather(*(bound(m) for m in user_messages))
+
+
+def process_transcripts_batch(client, model, system_prompt, user_messages, poll_interval=10, max_poll_interval=120):
+    """
+    Submit the user messages as a single Message Batch and wait for it to end.
+    Returns the responses in the order of user_messages (None for a request that failed).
+    """
+    batch = client.messages.batches.create(
+        requests=[
+            {
+                "custom_id": str(i),
+                "params": {
+                    "model": model,
+                    "system": system_prompt,
+                    "max_tokens": 2000,
+                    "messages": [
+                        {"role": "user", "content": user_message}
+                    ],
+                },
+            }
+            for i, user_message in enumerate(user_messages)
+        ]
+    )
+
+    # batches usually take minutes, so back off while polling
+    delay = poll_interval
+    while batch.processing_status != "ended":
+        time.sleep(delay)
+        delay = min(delay * 2, max_poll_interval)
+        batch = client.messages.batches.retrieve(batch.id)
+
+    responses = [None] * len(user_messages)
+    for entry in client.messages.batches.results(batch.id):
+        if entry.result.type == "succeeded":
+            responses[int(entry.custom_id)] = "".join(
+                block.text for block in entry.result.message.content if block.type == "text")
+    return responses
+
+
+def response_cache_key(model, system_prompt, user_message):
+    # the key covers everything that is sent, so a changed transcript or prompt is a miss
+    payload = json.dumps([model, system_prompt, user_message], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
 
-    return(chunk_correction)
+def read_cached_response(cache_dir, key, max_age=None):
+    path = os.path.join(cache_dir, f"{key}.txt")
+    if not os.path.isfile(path):
+        return None
+    if max_age is not None and time.time() - os.path.getmtime(path) > max_age:
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
 
 
+def write_cached_response(cache_dir, key, response):
+    os.makedirs(cache_dir, exist_ok=True)
+    # atomic, so a run killed mid-write can't leave a truncated response that later hits
+    write_text_atomic(os.path.join(cache_dir, f"{key}.txt"), response)
@@ -1,53 +1,88 @@
 import base64
 import os
+import subprocess
+import threading
+from functools import lru_cache
 import tiktoken
 
+# Script for components.html blocks whose <button data-t="secs"> elements seek the
+# page's st.audio player. The component iframe is same-origin, so it can reach the
+# parent document. One delegated listener serves every button in the block.
+SEEK_PARENT_AUDIO_JS = """
+<script>
+    function seek(t) {
+        const audioPlayer = window.parent.document.querySelector('audio');
+        if (!audioPlayer) return;
+        audioPlayer.currentTime = t;
+        audioPlayer.play();
+    }
+    document.addEventListener('click', function(e) {
+        const button = e.target.closest('button[data-t]');
+        if (button) seek(Number(button.dataset.t));
+    });
+</script>
+"""
+
+
 def find_video (dir):
-    for i in os.listdir(dir):
-        # List files with .mp4
-        if i.endswith(".mp4"):
-            print("Files with extension .mp4 are:", i)
-            return dir+"/"+i
+    # scandir is lazy, so we stop reading the directory at the first match
+    with os.scandir(dir) as it:
+        for entry in it:
+            if entry.name.endswith(".mp4"):
+                print("Files with extension .mp4 are:", entry.name)
+                return entry.path
 def find_audio (dir):
-    for i in os.listdir(dir):
-        # List files with .mp4
-        if i.endswith(".mp3"):
-            print("Files with extension .mp3 are:", i)
-            return dir+"/"+i
+    with os.scandir(dir) as it:
+        for entry in it:
+            if entry.name.endswith(".mp3"):
+                print("Files with extension .mp3 are:", entry.name)
+                return entry.path
 
 def find_txt (dir,sub_name):
-
-    for f in os.listdir(dir):
-        # List files with .mp4
-        if f.endswith(".txt"):
-            if sub_name.lower() in f.lower():
-                print("File found: ", f)
-                return dir+"/"+f
+    sub_name = sub_name.lower()
+    with os.scandir(dir) as it:
+        for entry in it:
+            if entry.name.endswith(".txt") and sub_name in entry.name.lower():
+                print("File found: ", entry.name)
+                return entry.path
     return None
 
-def source_key(param="OPENAI_API_KEY"):
-    # Load the contents of ~/.bashrc into environment variables
+def source_bashrc():
+    # Load the export lines of ~/.bashrc into environment variables
     bashrc_path = os.path.expanduser("~/.bashrc")
+    if not os.path.isfile(bashrc_path):
+        return
     with open(bashrc_path, "r") as f:
-        bashrc_contents = f.read()
+        for line in f:
+            # Parse lines in the format: export VARIABLE=value
+            if line.startswith("export "):
+                parts = line.split(" ", 1)[1].split("=", 1)
+                if len(parts) == 2:
+                    variable, value = parts
+                    os.environ[variable] = value.strip().strip('"')
+
 
-    # Split the contents into lines and process each line
-    for line in bashrc_contents.split("\n"):
-        # Skip empty lines and comments
-        if not line.strip() or line.strip().startswith("#"):
-            continue
+def source_key(param="OPENAI_API_KEY"):
+    # A key exported in the shell is used as is; otherwise read ~/.env, and
+    # only then fall back to scanning ~/.bashrc
+    if param not in os.environ:
+        # python-dotenv is optional; without it the ~/.env step is skipped
+        try:
+            from dotenv import load_dotenv
+        except ImportError:
+            pass
+        else:
+            load_dotenv(os.path.expanduser("~/.env"))
+    if param not in os.environ:
+        source_bashrc()
+    return os.environ.get(param)
 
-        # Parse lines in the format: export VARIABLE=value
-        if line.startswith("export "):
-            parts = line.split(" ", 1)[1].split("=", 1)
-            if len(parts) == 2:
-                variable, value = parts
-                os.environ[variable] = value.strip('"')
 
-    # Now you can access the environment variables as if they were set in the shell
-    print(os.environ[param])
-    return  (os.environ[param])
 
+@lru_cache(maxsize=None)
+def get_encoder(name="cl100k_base"):
+    # loading the BPE ranks is expensive; build each encoder once per process
+    return tiktoken.get_encoding(name)
 
 
 def split_transcript_into_chunks(transcript, max_tokens=3500):
@@ -58,30 +93,16 @@ def split_transcript_into_chunks(transcript, max_tokens=3500):
     :param max_tokens: Maximum number of tokens per chunk
     :return: List of transcript chunks
     """
-    # Initialize the tokenizer
-    enc = tiktoken.get_encoding("cl100k_base")
+    enc = get_encoder()
 
-    # Tokenize the entire transcript
-    tokens = enc.encode(transcript)
+    # Tokenize the entire transcript (plain text, so skip the special-token scan)
+    tokens = enc.encode_ordinary(transcript)
+    if 0 < len(tokens) <= max_tokens:
+        # fits in one call: keep the original text rather than a decode round trip
+        return [transcript]
 
-    chunks = []
-    current_chunk = []
-    current_chunk_tokens = 0
-
-    for token in tokens:
-        if current_chunk_tokens + 1 > max_tokens:
-            # If adding this token would exceed the limit, save the current chunk
-            chunks.append(enc.decode(current_chunk))
-            current_chunk = []
-            current_chunk_tokens = 0
-
-        current_chunk.append(token)
-        current_chunk_tokens += 1
-
-    # Add the last chunk if it's not empty
-    if current_chunk:
-        chunks.append(enc.decode(current_chunk))
-    return chunks
+    # Slice the token list into max_tokens windows and decode them in one call
+    return enc.decode_batch([tokens[i:i + max_tokens] for i in range(0, len(tokens), max_tokens)])
 
 
 def remove_before_token(string, token):
@@ -103,16 +124,37 @@ def get_binary_file_downloader_html(bin_file, file_label='mp3'):
     href = f'<a href="data:application/octet-stream;base64,{bin_str}" download="{os.path.basename(bin_file)}">Download {file_label}</a>'
     return href
 def secs2str(secs):
-    h=int(secs/3600)
-    m=int((secs-h*3600)/60)
-    s = secs - h*3600 - m*60
-    h_s =f"{h:02d}"
-    m_s = f"{m:02d}"
-    s_s = f"{s:02d}"
+    m, s = divmod(max(int(secs), 0), 60)
+    h, m = divmod(m, 60)
     if h>0:
-        return f"{h_s}:{m_s}:{s_s}"
+        return f"{h:02d}:{m:02d}:{s:02d}"
     else:
-        return f"{m_s}:{s_s}"
+        return f"{m:02d}:{s:02d}"
+
+def write_text_atomic(path, text):
+    # Write to a temp file next to path, flush it to disk, then rename over path, so
+    # a crash leaves either the old file or the new one, never a truncated one.
+    data = memoryview(text.encode("utf-8"))
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        try:
+            written = 0
+            while written < len(data):
+                written += os.write(fd, data[written:])
+            # fdatasync skips the metadata-only flush; Windows has only fsync
+            (os.fdatasync if hasattr(os, "fdatasync") else os.fsync)(fd)
+        finally:
+            os.close(fd)
+        os.replace(tmp, path)
+    except BaseException:
+        # a failed write, sync or rename (e.g. ENOSPC) must not leave the temp file behind
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
 
 def get_audio_file_content(file_path):
     # Check if the file exists
@@ -124,4 +166,17 @@ def get_audio_file_content(file_path):
     base64_bytes = base64.b64encode(audio_bytes)
     base64_string = base64_bytes.decode('utf-8')
     # Assuming the file is an mp3; adjust the mime type if different
-    return base64_string
\ No newline at end of file
+    return base64_string
+
+def wav_to_mp3(data, bitrate="128k"):
+    # WAV is uncompressed (about 10x the size of a 128k MP3 for speech); returns None
+    # when ffmpeg is missing or fails, so callers can keep the original
+    try:
+        result = subprocess.run(
+            ["ffmpeg", "-hide_banner", "-loglevel", "error", "-f", "wav", "-i", "pipe:0",
+             "-c:a", "libmp3lame", "-b:a", bitrate, "-f", "mp3", "pipe:1"],
+            input=data, capture_output=True, check=True)
+    except (OSError, subprocess.CalledProcessError) as e:
+        print(f"WAV to MP3 conversion failed ({e}); keeping the WAV")
+        return None
+    return result.stdout